@@ -1,8 +1,25 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from dl_plus import ytdl
 from dl_plus.extractor import Extractor, ExtractorError, ExtractorPlugin
 
 
-try_get, urljoin = ytdl.import_from('utils', ['try_get', 'urljoin'])
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+urljoin, = ytdl.import_from('utils', ['urljoin'])
 
 
 __version__ = '0.2.1'
@@ -11,11 +28,25 @@ __version__ = '0.2.1'
 plugin = ExtractorPlugin(__name__)
 
 
+# simdjson parsers reuse their internal buffers, keep one per thread
+_simdjson_parsers = threading.local()
+
+
+def _get_simdjson_parser():
+    parser = getattr(_simdjson_parsers, 'parser', None)
+    if parser is None:
+        parser = _simdjson_parsers.parser = simdjson.Parser()
+    return parser
+
+
 class GoodGameBaseExtractor(Extractor):
     DLP_BASE_URL = r'https?://(?:www\.)?goodgame\.ru/'
 
     _API_V4_BASE_URL = 'https://goodgame.ru/api/4/'
 
+    # stream_key -> stream_id, shared by all extractor instances
+    _STREAM_ID_CACHE = {}
+
     def _fetch(self, endpoint, *, description, item_id, **query_args):
         """
         Fetch the resource using GoodGame API.
@@ -29,16 +60,75 @@ class GoodGameBaseExtractor(Extractor):
             purposes).
 
         Any additional keyword arguments are used to build URI query component.
+
+        The request goes through the downloader's request handler, so proxy,
+        cookie and header options are honored; the pooled (keep-alive)
+        handler is used when `requests` is installed.
         """
-        if not endpoint.startswith('http'):
-            endpoint = urljoin(self._API_V4_BASE_URL, endpoint)
-        return self._download_json(
-            endpoint,
+        content = self._download_webpage(
+            self._build_api_url(endpoint),
             item_id,
             query=query_args,
             note=f'Downloading {description} data',
             errnote=f'Unable to download {description} data',
         )
+        return self._decode_response(
+            content, description=description, item_id=item_id)
+
+    def _build_api_url(self, endpoint):
+        if not endpoint.startswith('http'):
+            return self._API_V4_BASE_URL + endpoint
+        return endpoint
+
+    def _decode_response(self, content, *, description, item_id):
+        try:
+            return self._parse_json_fast(content)
+        except ValueError as exc:
+            raise ExtractorError(
+                f'Unable to parse {description} data',
+                cause=exc, video_id=item_id,
+            )
+
+    def _parse_json_fast(self, content):
+        """
+        Decode the response body (either `str` or `bytes`).
+
+        Use `orjson` or `simdjson` if any of them is installed, fall back to
+        the stdlib `json` otherwise.
+        """
+        if orjson:
+            return orjson.loads(content)
+        if simdjson:
+            # convert the whole document to native Python objects, no proxy
+            # objects are kept alive, so the parser can be reused
+            if isinstance(content, str):
+                content = content.encode()
+            return _get_simdjson_parser().parse(content, recursive=True)
+        return json.loads(content)
+
+    def _gather(self, *calls):
+        """
+        Run independent blocking calls concurrently.
+
+        Each positional argument is a callable taking no arguments. The results
+        are returned in the same order as the calls. The method waits for all
+        calls to finish; if any of them raised, the exception is re-raised.
+
+        The calls are expected to be safe to run in parallel threads, that is,
+        to only use the downloader for network requests and logging.
+
+        If request throttling (`--sleep-requests`) is enabled, the calls are
+        run sequentially, stopping at the first exception, since concurrent
+        requests would sleep simultaneously and then fire together.
+        """
+        if self.get_param('sleep_interval_requests'):
+            return [call() for call in calls]
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = [executor.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def _get_streamer_username(self, stream):
+        return (stream.get('streamer') or {}).get('username')
 
     def _fetch_stream_by_stream_key(self, stream_key):
         # stream_id and stream_key are not always the same, see:
@@ -46,11 +136,15 @@ class GoodGameBaseExtractor(Extractor):
         # id = 1644, key = "pomi" (Pomi)
         # there is no API v4 method to fetch stream by key, we use
         # legacy (v1) API to extract id first
-        player = self._fetch(
-            'https://goodgame.ru/api/player', src=stream_key,
-            item_id=stream_key, description='player',
-        )
-        stream_id = player['channel_id']
+        # the mapping is static, so it is cached for the process lifetime
+        stream_id = self._STREAM_ID_CACHE.get(stream_key)
+        if stream_id is None:
+            player = self._fetch(
+                'https://goodgame.ru/api/player', src=stream_key,
+                item_id=stream_key, description='player',
+            )
+            stream_id = player['channel_id']
+            self._STREAM_ID_CACHE[stream_key] = stream_id
         return self._fetch(
             f'streams/2/id/{stream_id}',
             item_id=stream_id, description='stream',
@@ -76,7 +170,7 @@ class GoodGameStreamExtractor(GoodGameBaseExtractor):
             stream_key = stream['streamKey']
         elif stream_key:
             stream = self._fetch_stream_by_stream_key(stream_key)
-            username = try_get(stream, lambda s: s['streamer']['username'])
+            username = self._get_streamer_username(stream)
         else:
             assert False, 'should not reach here'
         video_id = username or stream_key
@@ -103,43 +197,32 @@ class GoodGameVODExtractor(GoodGameBaseExtractor):
     _STORAGE_BASE_URL = 'https://storage2.goodgame.ru/'
     _THUMBNAIL_KEYS = ('jpgSmall', 'jpgFull', 'png')
 
+    # stream_key ->
+    #   (monotonic fetch time, conditional request headers, vods by moddate)
+    _VODS_CACHE = {}
+    _VODS_CACHE_TTL = 300
+
     def _real_extract(self, url):
         stream_key, timestamp = self._match_valid_url(url).group(
             'stream_key', 'timestamp')
         video_id = f'{stream_key}/{timestamp}'
-        vods = self._fetch(
-            urljoin(self._STORAGE_BASE_URL, 'api/json/channel/video'),
-            streamId=stream_key,
-            item_id=stream_key, description='vods',
+        # the stream info is only needed for metadata and does not depend
+        # on the vod, fetch it while the vod and its manifest are downloaded
+        (vod, formats), stream = self._gather(
+            partial(self._extract_vod, stream_key, timestamp, video_id),
+            partial(self._fetch_stream_by_stream_key, stream_key),
         )
-        for vod in vods['vods']:
-            if vod['moddate'] == timestamp:
-                break
-        else:
-            raise ExtractorError('vod not found')
-        if m3u8_path := vod.get('m3u8path'):
-            formats = self._extract_m3u8_formats(
-                self._build_absolute_url(m3u8_path),
-                video_id=video_id, fatal=False,
-            )
-            self._sort_formats(formats)
-        else:
-            formats = None
-        thumbnails = []
         preview_path = vod.get('previewpath', {})
-        for preference, key in enumerate(self._THUMBNAIL_KEYS):
-            url = preview_path.get(key)
-            if not url:
-                continue
-            thumbnails.append({
-                'url': self._build_absolute_url(url),
-                'preference': preference,
-            })
-        stream = self._fetch_stream_by_stream_key(stream_key)
+        build_absolute_url = self._build_absolute_url
+        thumbnails = [
+            {'url': build_absolute_url(url), 'preference': preference}
+            for preference, key in enumerate(self._THUMBNAIL_KEYS)
+            if (url := preview_path.get(key))
+        ]
         info_dict = {
             'id': video_id,
             'title': timestamp,
-            'creator': try_get(stream, lambda s: s['streamer']['username']),
+            'creator': self._get_streamer_username(stream),
             'thumbnails': thumbnails,
             'is_live': False,
         }
@@ -149,6 +232,69 @@ class GoodGameVODExtractor(GoodGameBaseExtractor):
             info_dict['url'] = self._build_absolute_url(vod['mp4path'])
         return info_dict
 
+    def _extract_vod(self, stream_key, timestamp, video_id):
+        vod = self._get_vod(stream_key, timestamp)
+        if vod is None:
+            raise ExtractorError('vod not found')
+        if m3u8_path := vod.get('m3u8path'):
+            formats = self._extract_m3u8_formats(
+                self._build_absolute_url(m3u8_path),
+                video_id=video_id, fatal=False,
+            )
+            self._sort_formats(formats)
+        else:
+            formats = None
+        return vod, formats
+
+    def _get_vod(self, stream_key, timestamp):
+        """
+        Get the vod by `moddate` using the cached vods index if possible.
+
+        The vods index of a channel is cached for `_VODS_CACHE_TTL` seconds.
+        If the cached index is stale or has no such vod (the vod could be
+        published after the index was cached), the list is requested again
+        conditionally, and the cached index is reused on 304 Not Modified.
+        """
+        conditional_headers = None
+        if cached := self._VODS_CACHE.get(stream_key):
+            fetched_at, conditional_headers, vod_by_date = cached
+            if time.monotonic() - fetched_at < self._VODS_CACHE_TTL:
+                if (vod := vod_by_date.get(timestamp)) is not None:
+                    return vod
+        fetched_at = time.monotonic()
+        content, urlh = self._download_webpage_handle(
+            self._STORAGE_BASE_URL + 'api/json/channel/video',
+            stream_key,
+            query={'streamId': stream_key},
+            headers=conditional_headers or {},
+            expected_status=304,
+            note='Downloading vods data',
+            errnote='Unable to download vods data',
+        )
+        if not cached or urlh.status != 304:
+            vods = self._decode_response(
+                content, description='vods', item_id=stream_key)
+            vod_by_date = self._index_vods(vods['vods'])
+            conditional_headers = self._get_conditional_headers(urlh)
+        self._VODS_CACHE[stream_key] = (
+            fetched_at, conditional_headers, vod_by_date)
+        return vod_by_date.get(timestamp)
+
+    def _get_conditional_headers(self, urlh):
+        headers = {}
+        if etag := urlh.headers.get('ETag'):
+            headers['If-None-Match'] = etag
+        if last_modified := urlh.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _index_vods(self, vods):
+        """Map vod `moddate` to vod keeping the first vod on collision."""
+        vod_by_date = {}
+        for vod in vods:
+            vod_by_date.setdefault(vod['moddate'], vod)
+        return vod_by_date
+
     def _build_absolute_url(self, url):
         if not url.startswith('http'):
             return urljoin(self._STORAGE_BASE_URL, url)
@@ -168,9 +314,8 @@ class GoodGameClipExtractor(GoodGameBaseExtractor):
         return {
             'id': clip_id,
             'title': clip.get('title', clip_id),
-            'creator': try_get(
-                clip, lambda c: c['stream']['streamer']['username']),
-            'uploader': try_get(clip, lambda c: c['author']['username']),
+            'creator': self._get_streamer_username(clip.get('stream') or {}),
+            'uploader': (clip.get('author') or {}).get('username'),
             'thumbnail': clip.get('thumbnail'),
             'view_count': clip.get('views'),
             'timestamp': clip.get('created'),